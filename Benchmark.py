@@ -0,0 +1,425 @@
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import Config as config
+
+# Sections which can be selected on the command line
+SECTIONS = ['word2vec', 'http', 'matrix-factorization']
+# Characters used in generated vocabulary entries
+CHARSET = "abcdefghijklmnopqrstuvwxyz"
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Summarizes a list of timings
+#
+# samples -> Measured durations in seconds
+#
+# Returns: Dictionary holding number of samples, min, max, mean, median and 95th
+# percentile of the given durations in seconds
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def summarize(samples):
+    ordered = sorted(samples)
+    return {'count': len(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': statistics.mean(ordered),
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]}
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Calls the given function repeatedly and measures the duration of each call
+#
+# function  -> Function to measure
+# repeats   -> Number of measured calls
+# args      -> Arguments passed to the function
+#
+# Returns: Summary of the measured durations (see summarize(...))
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def timeCalls(function, repeats, *args):
+    samples = list()
+    for i in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Generates a vocabulary of distinct words which are neither stop words nor
+# punctuation, so Word2Vec.filterWordList(...) keeps all of them
+#
+# rng   -> Seeded random number generator
+# size  -> Number of words
+#
+# Returns: List of words
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def generateVocabulary(rng, size):
+    words = list()
+    for i in range(size):
+        # Index suffix keeps words distinct, random prefix varies their length
+        prefix = ""
+        for j in range(rng.randint(3, 12)):
+            prefix += CHARSET[rng.randrange(len(CHARSET))]
+        words.append(prefix + str(i))
+    return words
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Writes a synthetic word2vec model in the binary format read by load_model in
+# 'word_center.c': A text header "<words> <dimensions>\n" followed by, for every
+# word, the word itself, a space, the vector as native 32 bit floats and a
+# newline
+#
+# path          -> Location of the generated model file
+# words         -> Vocabulary of the model
+# dimensionality-> Number of dimensions of each word vector
+# rng           -> Seeded random number generator
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def writeWord2VecModel(path, words, dimensionality, rng):
+    with open(path, 'wb') as modelFile:
+        modelFile.write(bytes('%d %d\n' % (len(words), dimensionality), 'utf-8'))
+        for word in words:
+            modelFile.write(bytes(word + ' ', 'utf-8'))
+            array('f', [rng.uniform(-1, 1) for i in range(dimensionality)])\
+                .tofile(modelFile)
+            modelFile.write(b'\n')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Generates synthetic user-item ratings and splits them into training and test
+# data. Test ratings only refer to users and items which also occur in the
+# training data, as the model cannot predict ratings for unknown ones.
+#
+# rng       -> Seeded random number generator
+# users     -> Number of users
+# items     -> Number of items
+# density   -> Fraction of user-item pairs which are rated
+# testShare -> Fraction of ratings held back as test data
+#
+# Returns: Training and test ratings, each as dictionary of the form
+# {user_u: {item_i: rating_ui}}
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def generateRatings(rng, users, items, density, testShare):
+    train = dict()
+    test = list()
+    for user in range(users):
+        train[user] = dict()
+        # Every user rates at least one item
+        rated = rng.sample(range(items), max(1, int(items * density)))
+        for item in rated:
+            rating = float(rng.randint(1, 5))
+            if rng.random() < testShare:
+                test.append((user, item, rating))
+            else:
+                train[user][item] = rating
+    trainItems = set()
+    for user in train:
+        trainItems.update(train[user])
+    testData = dict()
+    for (user, item, rating) in test:
+        if len(train[user]) > 0 and item in trainItems:
+            testData.setdefault(user, dict())[item] = rating
+    trainData = dict()
+    for user in train:
+        if len(train[user]) > 0:
+            trainData[user] = train[user]
+    return trainData, testData
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Counts the ratings contained in the given dictionary
+#
+# ratings -> Ratings of the form {user_u: {item_i: rating_ui}}
+#
+# Returns: Number of ratings
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def countRatings(ratings):
+    return sum(len(ratings[user]) for user in ratings)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Runs Spark in the configured local mode unless the caller already provided
+# submit arguments. ModelStorage creates its Spark Context on import, so this
+# has to happen before it is imported.
+#
+# args  -> Parsed command line arguments
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def configureSpark(args):
+    if not 'PYSPARK_SUBMIT_ARGS' in os.environ:
+        os.environ['PYSPARK_SUBMIT_ARGS'] = '--master ' + args.spark_master +\
+            ' pyspark-shell'
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Measures loading and freeing the word2vec model as well as single word lookups
+# and center computations through the C library
+#
+# args  -> Parsed command line arguments
+# words -> Vocabulary of the synthetic model
+# rng   -> Seeded random number generator
+#
+# Returns: Dictionary of timing summaries
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def benchmarkWord2Vec(args, words, rng):
+    import Word2Vec as w2v
+    results = dict()
+
+    loadSamples = list()
+    for i in range(args.load_repeats):
+        w2v.freeModel()
+        start = time.perf_counter()
+        w2v.loadModel()
+        loadSamples.append(time.perf_counter() - start)
+    results['load_model'] = summarize(loadSamples)
+
+    # Single word lookups directly through the C library, without the word
+    # filtering done in Python
+    lookupWords = [words[rng.randrange(len(words))]\
+        for i in range(args.lookups)]
+    lookupSamples = list()
+    for word in lookupWords:
+        padded = w2v.padWords([word])
+        start = time.perf_counter()
+        w2v.lib.compute_center(padded, 1)
+        lookupSamples.append(time.perf_counter() - start)
+    results['word_lookup'] = summarize(lookupSamples)
+
+    centerSamples = list()
+    for i in range(args.center_repeats):
+        wordList = rng.sample(words, min(args.words_per_request, len(words)))
+        start = time.perf_counter()
+        w2v.computeCenter(wordList)
+        centerSamples.append(time.perf_counter() - start)
+    results['compute_center'] = summarize(centerSamples)
+    results['compute_center']['words'] = args.words_per_request
+    return results
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Sends POST requests with word arrays to /word2vec from several concurrent
+# clients to a CustomHandler server running in a background thread. The model
+# has to be loaded already.
+#
+# args  -> Parsed command line arguments
+# words -> Vocabulary of the synthetic model
+# rng   -> Seeded random number generator
+#
+# Returns: Request throughput and latency summary
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def benchmarkHttp(args, words, rng):
+    # Http imports ModelStorage, which starts a Spark Context
+    configureSpark(args)
+    import Http
+    # Same server class as used by Http.py, bound to a free local port
+    srv = HTTPServer(('127.0.0.1', 0), Http.CustomHandler)
+    serverThread = threading.Thread(target=srv.serve_forever, daemon=True)
+    serverThread.start()
+    port = srv.server_address[1]
+
+    bodies = list()
+    for i in range(args.http_requests):
+        wordList = rng.sample(words, min(args.words_per_request, len(words)))
+        bodies.append(json.dumps(wordList))
+
+    def sendRequests(clientBodies):
+        latencies = list()
+        errors = 0
+        for body in clientBodies:
+            start = time.perf_counter()
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            try:
+                connection.request('POST', '/word2vec', body,
+                    {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if not response.status == 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            finally:
+                connection.close()
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    # Distribute requests evenly among the clients
+    chunks = [bodies[i::args.http_clients] for i in range(args.http_clients)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.http_clients) as executor:
+        clientResults = list(executor.map(sendRequests, chunks))
+    duration = time.perf_counter() - start
+    srv.shutdown()
+    srv.server_close()
+
+    latencies = list()
+    errors = 0
+    for (clientLatencies, clientErrors) in clientResults:
+        latencies.extend(clientLatencies)
+        errors += clientErrors
+    return {'clients': args.http_clients,
+        'requests': len(bodies),
+        'errors': errors,
+        'words': args.words_per_request,
+        'duration': duration,
+        'requests_per_second': len(bodies) / duration,
+        'latency': summarize(latencies)}
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Measures training, feature extraction and evaluation of Matrix Factorization
+# models on the synthetic ratings using the Spark Context of ModelStorage
+#
+# args      -> Parsed command line arguments
+# trainData -> Training ratings of the form {user_u: {item_i: rating_ui}}
+# testData  -> Test ratings of the form {user_u: {item_i: rating_ui}}
+#
+# Returns: Dictionary of timing summaries
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def benchmarkMatrixFactorization(args, trainData, testData):
+    configureSpark(args)
+    import ModelStorage as ms
+    import MatrixFactorization as mf
+    results = dict()
+
+    # Untimed warm-up run to exclude JVM start-up and code loading
+    model = mf.trainModel(ms.sc, trainData, args.rank, args.iterations,
+        args.lambda_val)
+    if model == None:
+        raise RuntimeError('Training Matrix Factorization model failed')
+
+    trainSamples = list()
+    for i in range(args.mf_repeats):
+        start = time.perf_counter()
+        model = mf.trainModel(ms.sc, trainData, args.rank, args.iterations,
+            args.lambda_val)
+        trainSamples.append(time.perf_counter() - start)
+    results['train'] = summarize(trainSamples)
+    results['get_model_features'] = timeCalls(ms.getModelFeatures,
+        args.mf_repeats, model)
+    if len(testData) > 0:
+        results['evaluate_model'] = timeCalls(mf.evaluateModel,
+            args.mf_repeats, model, testData)
+    return results
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Determines the commit of the working tree, if available
+#
+# Returns: The current git commit hash or None
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL, cwd=os.path.dirname(
+            os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Parses the command line arguments of the benchmark
+#
+# argv  -> Command line arguments without program name
+#
+# Returns: The parsed arguments
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks the word2vec and '
+        'Matrix Factorization paths on synthetic data')
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS,
+        default=SECTIONS, help='Parts of the service to benchmark')
+    # Not written to stdout, as the C library prints its output there
+    parser.add_argument('--output', default='benchmark.json',
+        help='File to write the JSON results to')
+    parser.add_argument('--data-dir', default=None,
+        help='Directory to keep the generated data in (default: temporary)')
+    parser.add_argument('--seed', type=int, default=42)
+    # word2vec
+    parser.add_argument('--vocabulary-size', type=int, default=100000)
+    parser.add_argument('--dimensionality', type=int, default=300)
+    parser.add_argument('--load-repeats', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--center-repeats', type=int, default=50)
+    parser.add_argument('--words-per-request', type=int, default=20)
+    # HTTP
+    parser.add_argument('--http-clients', type=int, default=8)
+    parser.add_argument('--http-requests', type=int, default=400)
+    # Matrix Factorization
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--density', type=float, default=0.02)
+    parser.add_argument('--test-share', type=float, default=0.1)
+    parser.add_argument('--rank', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--lambda', dest='lambda_val', type=float, default=0.01)
+    parser.add_argument('--mf-repeats', type=int, default=3)
+    parser.add_argument('--spark-master', default='local[*]')
+    return parser.parse_args(argv)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Generates the synthetic data, runs the selected benchmarks and writes the
+# results as JSON
+#
+# argv  -> Command line arguments without program name
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def main(argv):
+    args = parseArguments(argv)
+    tempDir = None
+    dataDir = args.data_dir
+    if dataDir == None:
+        tempDir = tempfile.TemporaryDirectory()
+        dataDir = tempDir.name
+    os.makedirs(dataDir, exist_ok=True)
+
+    report = {'commit': gitCommit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'results': dict()}
+
+    if 'word2vec' in args.sections or 'http' in args.sections:
+        rng = random.Random(args.seed)
+        words = generateVocabulary(rng, args.vocabulary_size)
+        modelPath = os.path.join(dataDir, 'synthetic-%d-%d.bin' %\
+            (args.vocabulary_size, args.dimensionality))
+        start = time.perf_counter()
+        writeWord2VecModel(modelPath, words, args.dimensionality, rng)
+        report['model_file'] = {'path': modelPath,
+            'bytes': os.path.getsize(modelPath),
+            'generation_time': time.perf_counter() - start}
+        # Word2Vec reads the model location from the config when loading
+        config.word2vec_model = modelPath
+        import Word2Vec as w2v
+        w2v.loadModel()
+        if 'word2vec' in args.sections:
+            report['results']['word2vec'] = benchmarkWord2Vec(args, words,
+                random.Random(args.seed))
+        if 'http' in args.sections:
+            report['results']['http'] = benchmarkHttp(args, words,
+                random.Random(args.seed))
+        w2v.freeModel()
+
+    if 'matrix-factorization' in args.sections:
+        trainData, testData = generateRatings(random.Random(args.seed),
+            args.users, args.items, args.density, args.test_share)
+        # Stored in the request format of the /matrix-factorization path
+        with open(os.path.join(dataDir, 'ratings.json'), 'w') as ratingsFile:
+            json.dump({'ratings': trainData, 'rank': args.rank,
+                'iterations': args.iterations, 'lambda': args.lambda_val},
+                ratingsFile)
+        report['ratings'] = {'train': countRatings(trainData),
+            'test': countRatings(testData)}
+        report['results']['matrix-factorization'] =\
+            benchmarkMatrixFactorization(args, trainData, testData)
+
+    with open(args.output, 'w') as outputFile:
+        json.dump(report, outputFile, indent=2)
+        outputFile.write('\n')
+    print('Results written to ' + args.output)
+    if not tempDir == None:
+        tempDir.cleanup()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
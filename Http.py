@@ -298,6 +298,7 @@ class CustomHandler(BaseHTTPRequestHandler):
         self.wfile.write(response['msg'].encode())
 
 # Start server
-srv = HTTPServer(('',config.port), CustomHandler)
-print('Server started on port %s' %config.port)
-srv.serve_forever()
+if __name__ == '__main__':
+    srv = HTTPServer(('',config.port), CustomHandler)
+    print('Server started on port %s' %config.port)
+    srv.serve_forever()